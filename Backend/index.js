@@ -3,34 +3,6 @@ const fs = require('fs');
 const path = require('path');
 const pickle = require('picklejs');
 
-// Preprocessing utilities
-const STOP_WORDS = new Set([
-  'i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', "you're", 
-  "you've", "you'll", "you'd", 'your', 'yours', 'yourself', 'yourselves', 
-  'he', 'him', 'his', 'himself', 'she', "she's", 'her', 'hers', 
-  'herself', 'it', "it's", 'its', 'itself', 'they', 'them', 'their', 
-  'theirs', 'themselves', 'what', 'which', 'who', 'whom', 'this', 
-  'that', "that'll", 'these', 'those', 'am', 'is', 'are', 'was', 
-  'were', 'be', 'been', 'being', 'have', 'has', 'had', 'having', 
-  'do', 'does', 'did', 'doing', 'a', 'an', 'the', 'and', 'but', 
-  'if', 'or', 'because', 'as', 'until', 'while', 'of', 'at', 
-  'by', 'for', 'with', 'about', 'against', 'between', 'into', 
-  'through', 'during', 'before', 'after', 'above', 'below', 'to', 
-  'from', 'up', 'down', 'in', 'out', 'on', 'off', 'over', 'under', 
-  'again', 'further', 'then', 'once', 'here', 'there', 'when', 
-  'where', 'why', 'how', 'all', 'any', 'both', 'each', 'few', 
-  'more', 'most', 'other', 'some', 'such', 'no', 'nor', 'not', 
-  'only', 'own', 'same', 'so', 'than', 'too', 'very', 's', 't', 
-  'can', 'will', 'just', 'don', "don't", 'should', "should've", 
-  'now', 'd', 'll', 'm', 'o', 're', 've', 'y', 'ain', 'aren', 
-  "aren't", 'couldn', "couldn't", 'didn', "didn't", 'doesn', 
-  "doesn't", 'hadn', "hadn't", 'hasn', "hasn't", 'haven', 
-  "haven't", 'isn', "isn't", 'ma', 'mightn', "mightn't", 'mustn', 
-  "mustn't", 'needn', "needn't", 'shan', "shan't", 'shouldn', 
-  "shouldn't", 'wasn', "wasn't", 'weren', "weren't", 'won', 
-  "won't", 'wouldn', "wouldn't"
-]);
-
 async function loadPickledObject(filePath) {
   try {
     const pickledData = fs.readFileSync(filePath);
@@ -42,21 +14,81 @@ async function loadPickledObject(filePath) {
   }
 }
 
-function preprocessText(text, featureNames) {
-  // Tokenize and clean text
-  const tokens = text.toLowerCase()
-    .replace(/[^\w\s]/g, '')  // Remove punctuation
-    .split(/\s+/)
-    .filter(token => !STOP_WORDS.has(token));
+// Mirrors extract_sender / preprocess_text in ml/model.py
+function extractSender(message) {
+  return message.split(':')[0].trim();
+}
+
+function cleanText(text) {
+  return text.toLowerCase()
+    .replace(/[^a-zA-Z\s]/g, '')
+    .replace(/\s+/g, ' ')
+    .trim();
+}
+
+// Replays the exported TfidfVectorizer: tokenize, drop stop words, n-grams, tf-idf, l2 norm
+function tfidfFeatures(block, text, features) {
+  const source = block.lowercase ? text.toLowerCase() : text;
+  const pattern = new RegExp(block.token_pattern.replace('(?u)', ''), 'gu');
+  const stopWords = new Set(block.stop_words);
+  const tokens = (source.match(pattern) || []).filter(token => !stopWords.has(token));
+
+  const counts = new Map();
+  const [minN, maxN] = block.ngram_range;
+  for (let n = minN; n <= Math.min(maxN, tokens.length); n++) {
+    for (let i = 0; i + n <= tokens.length; i++) {
+      const index = block.vocabulary[tokens.slice(i, i + n).join(' ')];
+      if (index !== undefined) {
+        counts.set(index, (counts.get(index) || 0) + 1);
+      }
+    }
+  }
+
+  let norm = 0;
+  const values = new Map();
+  counts.forEach((count, index) => {
+    const tf = block.sublinear_tf ? Math.log(count) + 1 : count;
+    const value = tf * block.idf[index];
+    values.set(index, value);
+    norm += block.norm === 'l1' ? Math.abs(value) : value * value;
+  });
+  if (block.norm === 'l2') {
+    norm = Math.sqrt(norm);
+  }
+
+  values.forEach((value, index) => {
+    features[block.offset + index] = norm > 0 && block.norm ? value / norm : value;
+  });
+}
+
+// Parse the sidecar once per path and index senders for O(1) lookup
+const sidecarCache = new Map();
+
+function loadSidecar(filePath) {
+  if (!sidecarCache.has(filePath)) {
+    const sidecar = JSON.parse(fs.readFileSync(filePath, 'utf8'));
+    sidecar.senderIndex = new Map(sidecar.label_encoders.sender.map((sender, i) => [sender, i]));
+    sidecarCache.set(filePath, sidecar);
+  }
+  return sidecarCache.get(filePath);
+}
+
+function preprocessText(text, sidecar) {
+  const senderIndex = sidecar.senderIndex.get(extractSender(text));
+  const columns = {
+    processed_message: cleanText(text),
+    sender_encoded: senderIndex === undefined ? -1 : senderIndex
+  };
 
   // Create feature vector
-  const features = new Array(5000).fill(0);
-  
-  tokens.forEach(token => {
-    // Find index of token in feature names
-    const index = featureNames.indexOf(token);
-    if (index !== -1) {
-      features[index] = 1;  // Binary feature representation
+  const features = new Float32Array(sidecar.n_features);
+  sidecar.blocks.forEach(block => {
+    if (block.type === 'tfidf') {
+      tfidfFeatures(block, columns[block.column], features);
+    } else if (block.type === 'passthrough') {
+      block.columns.forEach((column, j) => {
+        features[block.offset + j] = columns[column];
+      });
     }
   });
 
@@ -65,35 +97,32 @@ function preprocessText(text, featureNames) {
 
 async function predictUPIClassification(text) {
   try {
-    const vectorizerPath = path.join(__dirname, '..', 'ml', 'tfidf_vectorizer.pkl');
     const modelPath = path.join(__dirname, '..', 'ml', 'upi_classifier_model.onnx');
     const featureNamesPath = path.join(__dirname, '..', 'ml', 'tfidf_feature_names.json');
     
-    // Load feature names
-    const featureNames = JSON.parse(fs.readFileSync(featureNamesPath, 'utf8'));
+    // Load the vocabulary/IDF sidecar written by ml/onnx_export.py
+    const sidecar = loadSidecar(featureNamesPath);
     
     // Preprocess text
-    const features = preprocessText(text, featureNames);
+    const features = preprocessText(text, sidecar);
     
     // Create ONNX inference session
     const session = await ort.InferenceSession.create(modelPath);
-    const inputArray = Float32Array.from(features);
-    const inputTensor = new ort.Tensor('float32', inputArray, [1, 5000]);
+    const inputTensor = new ort.Tensor('float32', features, [1, sidecar.n_features]);
 
     // Run inference
     const results = await session.run({ 'input': inputTensor });
     
-    // Extract prediction
-    const outputName = session.outputNames[0];
-    const predictionTensor = results[outputName];
-    const prediction = Array.from(predictionTensor.data);
+    // Extract prediction (outputs are [label, probabilities])
+    const label = Number(results[session.outputNames[0]].data[0]);
+    const probabilities = Array.from(results[session.outputNames[1]].data);
     
     // Interpret prediction
-    const isUPI = prediction[0] > 0.5;
+    const isUPI = label === 1;
     
     return {
       isUPI: isUPI,
-      confidence: prediction[0]
+      confidence: Math.max(...probabilities)
     };
   } catch (error) {
     console.error('UPI Classification Error:', error);
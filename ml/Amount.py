@@ -9,6 +9,8 @@ from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 from sklearn.base import BaseEstimator, TransformerMixin
+import scipy.sparse as sp
+from dataset_cache import CACHE_DIR, FeaturizedDataset, cached_dataset
 
 class MessageFeatureExtractor(BaseEstimator, TransformerMixin):
     def __init__(self):
@@ -49,7 +51,31 @@ class MessageFeatureExtractor(BaseEstimator, TransformerMixin):
         
         return np.array(features)
 
+def load_extraction_models(path='upi_extraction_models.pkl'):
+    """
+    Load the saved extraction models, checking they came from train_extraction_models
+    
+    Raises:
+        ValueError: If the sender/merchant label encoders are missing or unfitted
+    """
+    models = joblib.load(path)
+    for key in ('sender_encoder', 'merchant_encoder'):
+        if not isinstance(models.get(key), LabelEncoder) or not hasattr(models[key], 'classes_'):
+            raise ValueError(
+                f"{path} has no fitted {key}; retrain with `python Amount.py` "
+                "(trains on upi_extraction.csv) before running inference or export"
+            )
+    return models
+
 class UPIMessageExtractor:
+    # Featurizer settings; any change here invalidates the dataset cache
+    featurizer_config = {
+        'version': 2,
+        'tfidf': {'stop_words': 'english', 'max_features': 5000, 'ngram_range': (1, 2)},
+        'test_size': 0.2,
+        'random_state': 42
+    }
+
     def __init__(self):
         # Initialize encoders
         self.sender_encoder = LabelEncoder()
@@ -57,17 +83,13 @@ class UPIMessageExtractor:
         
         # Feature extractor and preprocessor
         self.feature_extractor = MessageFeatureExtractor()
-        self.text_vectorizer = TfidfVectorizer(
-            stop_words='english', 
-            max_features=5000, 
-            ngram_range=(1, 2)
-        )
+        self.text_vectorizer = TfidfVectorizer(**self.featurizer_config['tfidf'])
         
-        # Preprocessing pipeline
+        # Preprocessing pipeline; sender and merchant are prediction targets,
+        # so only the message text is used as input
         self.preprocessor = ColumnTransformer(
             transformers=[
-                ('text', self.text_vectorizer, 'message'),  # Text vectorization
-                ('features', 'passthrough', ['sender', 'merchant'])  # Sender and merchant features
+                ('text', self.text_vectorizer, 'message')  # Text vectorization
             ])
     
     def prepare_dataset(self, messages=None, dataset_path=None):
@@ -129,59 +151,117 @@ class UPIMessageExtractor:
                 return merchant
         return 'Unknown'
     
-    def train_extraction_models(self, messages=None, dataset_path=None):
+    def featurize_dataset(self, messages=None, dataset_path=None):
         """
-        Train models for extracting UPI message details
+        Prepare the dataset and build its feature matrix
+        
+        The preprocessor is fit once on the training split and shared by
+        the sender, merchant and amount models.
         
         Args:
             messages (list, optional): List of messages
             dataset_path (str, optional): Path to CSV dataset
         
         Returns:
-            tuple: Trained models for sender, merchant, and amount
+            tuple: (arrays, matrices, artifacts) for cached_dataset
         """
-        # Prepare dataset
         df = self.prepare_dataset(messages, dataset_path)
         
         # Split data
-        X_train, X_test, y_sender_train, y_sender_test, \
-        y_merchant_train, y_merchant_test, \
-        y_amount_train, y_amount_test = train_test_split(
-            df[['message', 'sender', 'merchant']],  # Pass multiple columns
-            df['sender_encoded'], 
-            df['merchant_encoded'], 
-            df['amount'], 
-            test_size=0.2, 
-            random_state=42
+        train_idx, test_idx = train_test_split(
+            np.arange(len(df)),
+            test_size=self.featurizer_config['test_size'],
+            random_state=self.featurizer_config['random_state']
         )
         
-        # Sender classification pipeline
+        X = df[['message']]
+        self.preprocessor.fit(X.iloc[train_idx])
+        features = sp.csr_matrix(self.preprocessor.transform(X), dtype=np.float64)
+        
+        arrays = {
+            'sender_encoded': df['sender_encoded'].to_numpy(),
+            'merchant_encoded': df['merchant_encoded'].to_numpy(),
+            'amount': df['amount'].to_numpy(dtype=np.float64),
+            'train_idx': train_idx,
+            'test_idx': test_idx
+        }
+        artifacts = {
+            'preprocessor': self.preprocessor,
+            'sender_encoder': self.sender_encoder,
+            'merchant_encoder': self.merchant_encoder
+        }
+        return arrays, {'features': features}, artifacts
+    
+    def load_dataset(self, messages=None, dataset_path=None, cache_dir=CACHE_DIR):
+        """
+        Featurize the dataset, reusing the on-disk cache for CSV sources
+        
+        Returns:
+            FeaturizedDataset: Features, targets and fitted encoders
+        """
+        if dataset_path is None:
+            data = FeaturizedDataset(*self.featurize_dataset(messages=messages))
+        else:
+            data = cached_dataset(dataset_path, self.featurizer_config,
+                                  lambda: self.featurize_dataset(dataset_path=dataset_path),
+                                  cache_dir)
+        
+        self.preprocessor = data.artifacts['preprocessor']
+        self.sender_encoder = data.artifacts['sender_encoder']
+        self.merchant_encoder = data.artifacts['merchant_encoder']
+        return data
+    
+    def train_extraction_models(self, messages=None, dataset_path=None, cache_dir=CACHE_DIR):
+        """
+        Train models for extracting UPI message details
+        
+        Args:
+            messages (list, optional): List of messages
+            dataset_path (str, optional): Path to CSV dataset
+            cache_dir (str, optional): Featurized dataset cache; None disables it
+        
+        Returns:
+            tuple: Trained models for sender, merchant, and amount
+        """
+        # Prepare dataset
+        data = self.load_dataset(messages, dataset_path, cache_dir)
+        
+        X = data.matrices['features']
+        train_idx, test_idx = data.arrays['train_idx'], data.arrays['test_idx']
+        X_train, X_test = X[train_idx], X[test_idx]
+        targets = {
+            key: np.asarray(data.arrays[key])
+            for key in ('sender_encoded', 'merchant_encoded', 'amount')
+        }
+        
+        # Sender, merchant and amount estimators
+        sender_model = RandomForestClassifier(n_estimators=100)
+        merchant_model = RandomForestClassifier(n_estimators=100)
+        amount_model = RandomForestRegressor(n_estimators=100)
+        
+        # Train models
+        sender_model.fit(X_train, targets['sender_encoded'][train_idx])
+        merchant_model.fit(X_train, targets['merchant_encoded'][train_idx])
+        amount_model.fit(X_train, targets['amount'][train_idx])
+        
+        # Wrap with the fitted preprocessor so the saved models accept raw messages
         sender_pipeline = Pipeline([
             ('preprocessor', self.preprocessor),
-            ('classifier', RandomForestClassifier(n_estimators=100))
+            ('classifier', sender_model)
         ])
-        
-        # Merchant classification pipeline
         merchant_pipeline = Pipeline([
             ('preprocessor', self.preprocessor),
-            ('classifier', RandomForestClassifier(n_estimators=100))
+            ('classifier', merchant_model)
         ])
-        
-        # Amount regression pipeline
         amount_pipeline = Pipeline([
             ('preprocessor', self.preprocessor),
-            ('regressor', RandomForestRegressor(n_estimators=100))
+            ('regressor', amount_model)
         ])
         
-        # Train models
-        sender_pipeline.fit(X_train, y_sender_train)
-        merchant_pipeline.fit(X_train, y_merchant_train)
-        amount_pipeline.fit(X_train, y_amount_train)
-        
         # Evaluate models
-        print("Sender Model Accuracy:", sender_pipeline.score(X_test, y_sender_test))
-        print("Merchant Model Accuracy:", merchant_pipeline.score(X_test, y_merchant_test))
-        print("Amount Model R² Score:", amount_pipeline.score(X_test, y_amount_test))
+        print("Sender Model Accuracy:", sender_model.score(X_test, targets['sender_encoded'][test_idx]))
+        print("Merchant Model Accuracy:", merchant_model.score(X_test, targets['merchant_encoded'][test_idx]))
+        print("Amount Model R² Score:", amount_model.score(X_test, targets['amount'][test_idx]))
         
         # Save models and encoders
         joblib.dump({
@@ -207,14 +287,10 @@ class UPIMessageExtractor:
             dict: Predicted sender, merchant, and amount
         """
         # Load saved models
-        models = joblib.load('upi_extraction_models.pkl')
+        models = load_extraction_models()
         
         # Create a DataFrame with the correct structure
-        input_data = pd.DataFrame({
-            'message': [message],
-            'sender': ['Unknown'],  # Placeholder
-            'merchant': ['Unknown']  # Placeholder
-        })
+        input_data = pd.DataFrame({'message': [message]})
         
         # Predict sender, merchant, and amount
         sender_pred = models['sender_model'].predict(input_data)[0]
@@ -244,8 +320,9 @@ upi_messages = [
 if __name__ == "__main__":
     extractor = UPIMessageExtractor()
     
-    # Train models on sample messages
-    extractor.train_extraction_models(messages=upi_messages)
+    # Train models on the generated extraction dataset; the sample
+    # messages above are too few to train usable models
+    extractor.train_extraction_models(dataset_path='upi_extraction.csv')
     
     # Example predictions
     test_messages = [
@@ -1,17 +1,21 @@
+import os
 from flask import Flask, request, jsonify
-import joblib
 import numpy as np
-from Amount import UPIMessageExtractor
+from inference import load_backend, load_cascade
 
 # Initialize Flask app
 app = Flask(__name__)
 
-# Load the saved model and vectorizer
-model = joblib.load('upi_classifier_model.pkl')
-vectorizer = joblib.load('tfidf_vectorizer.pkl')
+# Load the inference backend ('sklearn' pickles or 'onnx' via onnxruntime)
+backend = load_backend(os.environ.get('UPI_INFERENCE_BACKEND', 'sklearn'))
 
-# Initialize the message extractor
-message_extractor = UPIMessageExtractor()
+# Optionally decide clear-cut messages with the learned rules before the model
+# (opt-in with UPI_CASCADE=1; check it first with `python inference.py cascade`)
+cascade = None
+if os.environ.get('UPI_CASCADE', '0') == '1':
+    # An explicit opt-in must not be ignored; a missing rules file fails startup
+    cascade = load_cascade(backend)
+    backend = cascade
 
 @app.route('/' , methods=['GET'])
 def home():
@@ -35,12 +39,10 @@ def predict():
         if not message:
             return jsonify({'error': 'No message provided'}), 400
 
-        # Vectorize the input message
-        message_vec = vectorizer.transform([message])
-
         # Make prediction
-        prediction = model.predict(message_vec)[0]
-        probabilities = model.predict_proba(message_vec)[0]
+        labels, probabilities = backend.classify([message])
+        prediction = labels[0]
+        probabilities = probabilities[0]
         # Get the probability of the predicted class
         max_prob = np.max(probabilities)
         return jsonify({
@@ -65,13 +67,22 @@ def extract_details():
         if not message:
             return jsonify({'error': 'No message provided'}), 400
 
-        # Extract details using the UPIMessageExtractor
-        details = message_extractor.predict_details(message)
+        # Extract details using the configured backend
+        details = backend.extract([message])[0]
         
         return jsonify(details)
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/cascade_stats', methods=['GET'])
+def cascade_stats():
+    """
+    Per-stage pass rates and latency of the classification cascade
+    """
+    if cascade is None:
+        return jsonify({'error': 'Cascade is disabled'}), 404
+    return jsonify({'stages': cascade.stats()})
+
 @app.route('/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy'}), 200
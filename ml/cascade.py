@@ -0,0 +1,121 @@
+import re
+import json
+from collections import Counter, defaultdict
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+# Words common to most transactional SMS (bank, shop or app alike); they
+# say nothing about UPI vs non-UPI on their own, so never become rules
+GENERIC_SMS_WORDS = frozenset([
+    'ac', 'account', 'added', 'amount', 'bank', 'confirmed', 'current', 'customer',
+    'dear', 'details', 'experience', 'inr', 'manage', 'money', 'new', 'order', 'pay',
+    'paid', 'payment', 'rate', 'reply', 'rs', 'sale', 'sent', 'share', 'shop', 'store',
+    'subscription', 'successful', 'valid', 'view', 'xx', 'xxxxx'
+])
+
+
+class CascadeRules:
+    """
+    Keyword and sender-ID rules that give a verdict without the ML model
+
+    A rule maps a keyword (a word of the lowercased message) or an exact
+    sender to a label and the precision it had on the training data. A
+    message gets a verdict only when every rule it matches agrees on the
+    label and it hits a sender rule or at least min_keyword_hits keyword
+    rules; anything else is left to the classifier.
+    """
+
+    def __init__(self, keywords=None, senders=None, classes=None, min_keyword_hits=2):
+        self.keywords = keywords or {}
+        self.senders = senders or {}
+        self.classes = classes or []
+        self.min_keyword_hits = min_keyword_hits
+
+    @staticmethod
+    def tokens(message):
+        """
+        Alphabetic words of the raw message
+
+        Punctuation and digits split words (zomato@upi -> zomato, upi), unlike
+        preprocess_text() which deletes them and glues fragments together.
+        """
+        return {t for t in re.findall(r'[a-z]+', str(message).lower())
+                if len(t) > 1 and t not in ENGLISH_STOP_WORDS and t not in GENERIC_SMS_WORDS}
+
+    @classmethod
+    def learn(cls, messages, senders, labels, target_labels=(0, 1),
+              min_support=100, min_precision=0.99, max_rules=64, min_keyword_hits=2):
+        """
+        Learn rules from training messages
+
+        Args:
+            messages (list): Raw training messages
+            senders (list): Senders from extract_sender()
+            labels (list): Training labels
+            target_labels (tuple): Labels rules may assign; learning both lets
+                UPI keywords veto a non-UPI verdict (and vice versa)
+            min_support (int): Minimum number of training messages backing a rule
+            min_precision (float): Minimum smoothed precision of a rule
+            max_rules (int): Maximum keyword and sender rules kept, by support
+            min_keyword_hits (int): Agreeing keyword rules needed for a verdict
+                when no sender rule matches
+
+        Returns:
+            CascadeRules: Learned rule set
+        """
+        keyword_counts = defaultdict(Counter)
+        sender_counts = defaultdict(Counter)
+        for message, sender, label in zip(messages, senders, labels):
+            label = int(label)
+            for token in cls.tokens(message):
+                keyword_counts[token][label] += 1
+            sender_counts[str(sender)][label] += 1
+
+        def select(counts):
+            candidates = []
+            for key, counter in counts.items():
+                label, support = counter.most_common(1)[0]
+                if label not in target_labels or support < min_support:
+                    continue
+                # One pseudo-count against the rule keeps small supports from reaching 1.0
+                precision = support / (sum(counter.values()) + 1)
+                if precision >= min_precision:
+                    candidates.append((support, key, label, precision))
+            candidates.sort(key=lambda c: (-c[0], c[1]))
+            return {key: [label, round(precision, 6)]
+                    for _, key, label, precision in candidates[:max_rules]}
+
+        classes = sorted({int(label) for label in labels})
+        return cls(select(keyword_counts), select(sender_counts), classes, min_keyword_hits)
+
+    def match(self, message, sender):
+        """
+        Return (label, precision) for a confident verdict, or None to defer
+
+        Args:
+            message (str): Raw message
+            sender (str): Sender from extract_sender()
+        """
+        hits = [self.keywords[t] for t in self.tokens(message) if t in self.keywords]
+        if sender in self.senders:
+            hits.append(self.senders[sender])
+        elif len(hits) < self.min_keyword_hits:
+            return None
+        if not hits or len({label for label, _ in hits}) > 1:
+            return None
+        return hits[0][0], max(precision for _, precision in hits)
+
+    def save(self, path='cascade_rules.json'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'classes': self.classes, 'min_keyword_hits': self.min_keyword_hits,
+                       'keywords': self.keywords, 'senders': self.senders},
+                      f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path='cascade_rules.json'):
+        with open(path, encoding='utf-8') as f:
+            rules = json.load(f)
+        return cls(rules['keywords'], rules['senders'], rules['classes'],
+                   rules.get('min_keyword_hits', 2))
+
+    def __len__(self):
+        return len(self.keywords) + len(self.senders)
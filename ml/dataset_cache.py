@@ -0,0 +1,150 @@
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import joblib
+import scipy.sparse as sp
+import sklearn
+
+# Default location of featurized datasets, relative to the ml/ working directory
+CACHE_DIR = '.dataset_cache'
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(source_path, config):
+    """
+    Key a cache entry on the source content, the featurizer config and the
+    sklearn/numpy versions (artifacts.pkl holds pickled sklearn objects)
+
+    Args:
+        source_path (str): Path to the source CSV
+        config (dict): Featurizer settings; any change yields a new key
+
+    Returns:
+        str: Hex digest identifying the entry
+    """
+    payload = json.dumps({
+        'data': file_digest(source_path),
+        'config': config,
+        'versions': {'sklearn': sklearn.__version__, 'numpy': np.__version__}
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class FeaturizedDataset:
+    """
+    Parsed columns, sparse feature matrices and fitted artifacts of one dataset
+
+    Attributes:
+        arrays (dict): Name to 1-D numpy array (labels, encodings, split indices)
+        matrices (dict): Name to scipy CSR matrix
+        artifacts (dict): Name to fitted object (preprocessor, label encoders)
+        key (str): Cache key, or None when built without a cache
+        from_cache (bool): Whether the entry was loaded from disk
+    """
+
+    def __init__(self, arrays, matrices, artifacts, key=None, from_cache=False):
+        self.arrays = arrays
+        self.matrices = matrices
+        self.artifacts = artifacts
+        self.key = key
+        self.from_cache = from_cache
+
+    def save(self, path):
+        """Write every array as .npy so it can be memory-mapped back"""
+        for name, array in self.arrays.items():
+            np.save(os.path.join(path, f'array.{name}.npy'), np.asarray(array))
+        for name, matrix in self.matrices.items():
+            matrix = sp.csr_matrix(matrix)
+            for part in ('data', 'indices', 'indptr'):
+                np.save(os.path.join(path, f'matrix.{name}.{part}.npy'), getattr(matrix, part))
+        joblib.dump(self.artifacts, os.path.join(path, 'artifacts.pkl'))
+
+        meta = {
+            'arrays': list(self.arrays),
+            'matrices': {name: list(m.shape) for name, m in self.matrices.items()}
+        }
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path, key=None):
+        """Memory-map a saved entry"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+
+        def _load(name):
+            return np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r')
+
+        arrays = {name: _load(f'array.{name}') for name in meta['arrays']}
+        matrices = {
+            name: sp.csr_matrix(
+                tuple(_load(f'matrix.{name}.{part}') for part in ('data', 'indices', 'indptr')),
+                shape=tuple(shape), copy=False
+            )
+            for name, shape in meta['matrices'].items()
+        }
+        artifacts = joblib.load(os.path.join(path, 'artifacts.pkl'), mmap_mode='r')
+        return cls(arrays, matrices, artifacts, key=key, from_cache=True)
+
+
+def _entry_prefix(source_path):
+    """Entry name prefix unique to one source file location"""
+    source_path = os.path.abspath(source_path)
+    path_hash = hashlib.sha256(source_path.encode('utf-8')).hexdigest()[:12]
+    return f'{os.path.basename(source_path)}-{path_hash}-'
+
+
+def _prune_stale(cache_dir, prefix, key):
+    """Drop older entries built from the same source file, leaving in-flight builds alone"""
+    for entry in os.listdir(cache_dir):
+        if entry.startswith(prefix) and entry != f'{prefix}{key}' and '.tmp-' not in entry:
+            shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+
+
+def cached_dataset(source_path, config, build, cache_dir=CACHE_DIR):
+    """
+    Load a featurized dataset from the cache, building it on a miss
+
+    Args:
+        source_path (str): Path to the source CSV
+        config (dict): Featurizer settings that are part of the cache key
+        build (callable): Returns (arrays, matrices, artifacts) for the source
+        cache_dir (str, optional): Cache location; None disables caching
+
+    Returns:
+        FeaturizedDataset: Memory-mapped entry, or a freshly built one
+    """
+    if cache_dir is None:
+        return FeaturizedDataset(*build())
+
+    key = cache_key(source_path, config)
+    prefix = _entry_prefix(source_path)
+    path = os.path.join(cache_dir, f'{prefix}{key}')
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        return FeaturizedDataset.load(path, key=key)
+
+    dataset = FeaturizedDataset(*build(), key=key)
+
+    # Write to a temporary directory first so a crash never leaves a half entry
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    dataset.save(tmp_path)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    _prune_stale(cache_dir, prefix, key)
+
+    dataset = FeaturizedDataset.load(path, key=key)
+    dataset.from_cache = False
+    return dataset
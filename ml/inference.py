@@ -0,0 +1,494 @@
+import os
+import sys
+import json
+import time
+import argparse
+import re
+from collections import Counter
+import numpy as np
+import joblib
+import pandas as pd
+from model import FEATURIZER_CONFIG, extract_sender, featurize_dataset, preprocess_text
+from dataset_cache import cached_dataset
+from cascade import CascadeRules
+from Amount import load_extraction_models
+
+
+def classifier_columns(messages, sender_classes):
+    """
+    Build the model.py classifier inputs for a batch of messages
+
+    Unseen senders are encoded as -1, matching predict_upi_message.
+    """
+    sender_index = {sender: i for i, sender in enumerate(sender_classes)}
+    return {
+        'processed_message': [preprocess_text(m) for m in messages],
+        'sender_encoded': [sender_index.get(extract_sender(m), -1) for m in messages]
+    }
+
+
+def extraction_columns(messages):
+    """Build the Amount.py extraction inputs (the models only read the message text)"""
+    return {'message': list(messages)}
+
+
+class SidecarFeaturizer:
+    """Replays a fitted ColumnTransformer from its JSON sidecar without sklearn"""
+
+    def __init__(self, spec):
+        self.n_features = spec['n_features']
+        self.blocks = spec['blocks']
+        for block in self.blocks:
+            if block['type'] == 'tfidf':
+                block['_pattern'] = re.compile(block['token_pattern'])
+                block['_stop_words'] = frozenset(block['stop_words'])
+                block['_idf'] = np.asarray(block['idf'], dtype=np.float64)
+            elif block['type'] == 'onehot':
+                block['_index'] = {c: i for i, c in enumerate(block['categories'])}
+
+    def _tfidf(self, block, text):
+        """Same analyzer as sklearn: tokenize, drop stop words, then build n-grams"""
+        if block['lowercase']:
+            text = text.lower()
+        tokens = [t for t in block['_pattern'].findall(text) if t not in block['_stop_words']]
+
+        min_n, max_n = block['ngram_range']
+        terms = []
+        for n in range(min_n, min(max_n, len(tokens)) + 1):
+            terms.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+        vocabulary = block['vocabulary']
+        counts = Counter(vocabulary[t] for t in terms if t in vocabulary)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+
+        if block['sublinear_tf']:
+            values = np.log(values) + 1
+        values = values * block['_idf'][indices]
+        if block['norm'] == 'l2':
+            norm = np.sqrt(np.sum(values ** 2))
+        elif block['norm'] == 'l1':
+            norm = np.sum(np.abs(values))
+        else:
+            norm = 0
+        if norm > 0:
+            values = values / norm
+        return indices, values
+
+    def transform(self, columns):
+        """
+        Featurize a batch of rows
+
+        Args:
+            columns (dict): Column name to list of values, one entry per row
+
+        Returns:
+            np.array: float32 feature matrix of shape (n_rows, n_features)
+        """
+        n_rows = len(next(iter(columns.values())))
+        X = np.zeros((n_rows, self.n_features), dtype=np.float32)
+
+        for block in self.blocks:
+            offset = block['offset']
+            if block['type'] == 'tfidf':
+                for row, text in enumerate(columns[block['column']]):
+                    indices, values = self._tfidf(block, str(text))
+                    X[row, offset + indices] = values
+            elif block['type'] == 'onehot':
+                for row, value in enumerate(columns[block['column']]):
+                    index = block['_index'].get(str(value))
+                    if index is not None:
+                        X[row, offset + index] = 1
+            else:
+                for j, column in enumerate(block['columns']):
+                    X[:, offset + j] = columns[column]
+
+        return X
+
+
+class SklearnBackend:
+    """Runs the pickled sklearn pipelines directly"""
+    name = 'sklearn'
+
+    def __init__(self, model_path='upi_classifier_model.pkl',
+                 encoder_path='sender_label_encoder.pkl',
+                 extraction_path='upi_extraction_models.pkl'):
+        self.model = joblib.load(model_path)
+        self.sender_classes = list(joblib.load(encoder_path).classes_)
+        self.extraction_path = extraction_path
+        self._extraction_models = None
+
+    @property
+    def extraction_models(self):
+        if self._extraction_models is None:
+            self._extraction_models = load_extraction_models(self.extraction_path)
+        return self._extraction_models
+
+    def classify(self, messages):
+        """Return predicted labels and class probabilities for a batch of messages"""
+        input_data = pd.DataFrame(classifier_columns(messages, self.sender_classes))
+        return self.model.predict(input_data), self.model.predict_proba(input_data)
+
+    def extract(self, messages):
+        """Return sender, merchant and amount predictions for a batch of messages"""
+        models = self.extraction_models
+        input_data = pd.DataFrame(extraction_columns(messages))
+
+        senders = models['sender_encoder'].inverse_transform(models['sender_model'].predict(input_data))
+        merchants = models['merchant_encoder'].inverse_transform(models['merchant_model'].predict(input_data))
+        amounts = models['amount_model'].predict(input_data)
+
+        return [
+            {'sender': s, 'merchant': m, 'amount': round(float(a), 2)}
+            for s, m, a in zip(senders, merchants, amounts)
+        ]
+
+
+class OnnxBackend:
+    """Runs the exported ONNX graphs on onnxruntime (CPU) with the sidecar featurizers"""
+    name = 'onnx'
+
+    def __init__(self, onnx_path='upi_classifier_model.onnx',
+                 sidecar_path='tfidf_feature_names.json',
+                 extraction_sidecar_path='upi_extraction_features.json'):
+        import onnxruntime as ort
+        self._ort = ort
+
+        with open(self._require(sidecar_path), encoding='utf-8') as f:
+            sidecar = json.load(f)
+        self.featurizer = SidecarFeaturizer(sidecar)
+        self.sender_classes = sidecar['label_encoders']['sender']
+        self.session = self._session(onnx_path)
+
+        self.extraction_sidecar_path = extraction_sidecar_path
+        self._extraction = None
+
+    @staticmethod
+    def _require(path):
+        """Exported artifacts are not committed; point at the export step when missing"""
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; run `python onnx_export.py` first")
+        return path
+
+    def _session(self, path):
+        return self._ort.InferenceSession(self._require(path), providers=['CPUExecutionProvider'])
+
+    @property
+    def extraction(self):
+        if self._extraction is None:
+            with open(self._require(self.extraction_sidecar_path), encoding='utf-8') as f:
+                sidecar = json.load(f)
+            sidecar_dir = os.path.dirname(os.path.abspath(self.extraction_sidecar_path))
+            self._extraction = {
+                'label_encoders': sidecar['label_encoders'],
+                'featurizer': SidecarFeaturizer(sidecar['features']),
+                'sessions': {
+                    key: self._session(os.path.join(sidecar_dir, spec['onnx_path']))
+                    for key, spec in sidecar['models'].items()
+                }
+            }
+        return self._extraction
+
+    @staticmethod
+    def _run(session, X):
+        return session.run(None, {session.get_inputs()[0].name: X})
+
+    def classify(self, messages):
+        """Return predicted labels and class probabilities for a batch of messages"""
+        X = self.featurizer.transform(classifier_columns(messages, self.sender_classes))
+        labels, probabilities = self._run(self.session, X)
+        return labels, probabilities
+
+    def extract(self, messages):
+        """Return sender, merchant and amount predictions for a batch of messages"""
+        extraction = self.extraction
+        # The three models share one preprocessor, so featurize the batch once
+        X = extraction['featurizer'].transform(extraction_columns(messages))
+
+        predictions = {
+            key: self._run(session, X)[0]
+            for key, session in extraction['sessions'].items()
+        }
+
+        sender_classes = extraction['label_encoders']['sender']
+        merchant_classes = extraction['label_encoders']['merchant']
+        return [
+            {
+                'sender': sender_classes[int(s)],
+                'merchant': merchant_classes[int(m)],
+                'amount': round(float(np.ravel(a)[0]), 2)
+            }
+            for s, m, a in zip(predictions['sender'], predictions['merchant'], predictions['amount'])
+        ]
+
+
+BACKENDS = {
+    'sklearn': SklearnBackend,
+    'onnx': OnnxBackend
+}
+
+
+def load_backend(name='sklearn'):
+    """Instantiate an inference backend by name ('sklearn' or 'onnx')"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+class CascadeClassifier:
+    """
+    Two-stage classifier: cheap keyword/sender rules, then the ML backend
+
+    Only messages the rules defer on reach the backend. Per-stage counts
+    and latency are accumulated across calls and reported by stats().
+    """
+
+    def __init__(self, rules, backend):
+        self.rules = rules
+        self.backend = backend
+        self.reset_stats()
+
+    def reset_stats(self):
+        self._stats = {
+            stage: {'messages': 0, 'decided': 0, 'seconds': 0.0}
+            for stage in ('rules', self.backend.name)
+        }
+
+    def _record(self, stage, messages, decided, seconds):
+        stats = self._stats[stage]
+        stats['messages'] += messages
+        stats['decided'] += decided
+        stats['seconds'] += seconds
+
+    def classify(self, messages):
+        """Return predicted labels and class probabilities for a batch of messages"""
+        classes = self.rules.classes
+        labels = np.empty(len(messages), dtype=np.int64)
+        probabilities = np.empty((len(messages), len(classes)), dtype=np.float64)
+
+        start = time.perf_counter()
+        deferred = []
+        for i, message in enumerate(messages):
+            verdict = self.rules.match(message, extract_sender(message))
+            if verdict is None:
+                deferred.append(i)
+                continue
+            label, precision = verdict
+            labels[i] = label
+            probabilities[i] = (1 - precision) / max(len(classes) - 1, 1)
+            probabilities[i, classes.index(label)] = precision
+        self._record('rules', len(messages), len(messages) - len(deferred),
+                     time.perf_counter() - start)
+
+        if deferred:
+            start = time.perf_counter()
+            model_labels, model_probabilities = self.backend.classify([messages[i] for i in deferred])
+            labels[deferred] = model_labels
+            probabilities[deferred] = model_probabilities
+            self._record(self.backend.name, len(deferred), len(deferred),
+                         time.perf_counter() - start)
+
+        return labels, probabilities
+
+    def extract(self, messages):
+        """Extraction has no prefilter; delegate to the backend"""
+        return self.backend.extract(messages)
+
+    def stats(self):
+        """
+        Per-stage pass rates and latency
+
+        Returns:
+            list: One dict per stage with messages seen, decided, pass rate
+                  (share handed to the next stage) and mean latency in ms
+        """
+        report = []
+        for stage, stats in self._stats.items():
+            seen = stats['messages']
+            report.append({
+                'stage': stage,
+                'messages': seen,
+                'decided': stats['decided'],
+                'pass_rate': (seen - stats['decided']) / seen if seen else 0.0,
+                'mean_latency_ms': stats['seconds'] * 1000 / seen if seen else 0.0
+            })
+        return report
+
+
+def load_cascade(backend, rules_path='cascade_rules.json'):
+    """Wrap a backend with the cascade prefilter learned by model.py"""
+    return CascadeClassifier(CascadeRules.load(rules_path), backend)
+
+
+def _load_messages(csv_path, limit=None):
+    messages = pd.read_csv(csv_path)['message'].astype(str).tolist()
+    return messages[:limit] if limit else messages
+
+
+def check_parity(classifier_csv='upi_dataset.csv', extraction_csv='upi_extraction.csv',
+                 limit=None, atol=1e-4):
+    """
+    Compare the ONNX backend against sklearn on the training datasets
+
+    Returns:
+        bool: True if every label matches and all scores agree within atol
+    """
+    sklearn_backend = SklearnBackend()
+    onnx_backend = OnnxBackend()
+    ok = True
+
+    messages = _load_messages(classifier_csv, limit)
+    sk_labels, sk_proba = sklearn_backend.classify(messages)
+    ox_labels, ox_proba = onnx_backend.classify(messages)
+    label_mismatches = int(np.sum(np.asarray(sk_labels) != np.asarray(ox_labels)))
+    proba_diff = float(np.max(np.abs(sk_proba - ox_proba)))
+    print(f"Classifier: {len(messages)} messages, {label_mismatches} label mismatches, "
+          f"max probability diff {proba_diff:.2e}")
+    ok = ok and label_mismatches == 0 and proba_diff <= atol
+
+    messages = _load_messages(extraction_csv, limit)
+    sk_details = sklearn_backend.extract(messages)
+    ox_details = onnx_backend.extract(messages)
+    for key in ('sender', 'merchant'):
+        mismatches = sum(a[key] != b[key] for a, b in zip(sk_details, ox_details))
+        print(f"Extraction {key}: {len(messages)} messages, {mismatches} mismatches")
+        ok = ok and mismatches == 0
+    # Amounts are rounded to paise, so allow one unit of rounding difference
+    amount_diff = max(abs(a['amount'] - b['amount']) for a, b in zip(sk_details, ox_details))
+    print(f"Extraction amount: max diff {amount_diff:.2f}")
+    ok = ok and amount_diff <= 0.01 + 1e-9
+
+    print("Parity OK" if ok else "Parity FAILED")
+    return ok
+
+
+def benchmark(csv_path='upi_dataset.csv', n_single=500, batch_size=256, repeats=5):
+    """
+    Measure single-message latency and batch throughput for each backend
+
+    Both the /predict classifier and the /extract_details models are timed.
+    """
+    messages = _load_messages(csv_path)
+    single = messages[:n_single]
+    batch = (messages * (batch_size // len(messages) + 1))[:batch_size]
+
+    print(f"{'backend':<8} {'task':<8} {'p50 ms':>8} {'p95 ms':>8} {'batch msg/s':>12}")
+    for name in BACKENDS:
+        backend = load_backend(name)
+        for task in ('classify', 'extract'):
+            run = getattr(backend, task)
+            run(single[:1])  # warm up lazy loading and session initialization
+
+            latencies = []
+            for message in single:
+                start = time.perf_counter()
+                run([message])
+                latencies.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            for _ in range(repeats):
+                run(batch)
+            throughput = repeats * len(batch) / (time.perf_counter() - start)
+
+            p50, p95 = np.percentile(latencies, [50, 95])
+            print(f"{name:<8} {task:<8} {p50:>8.3f} {p95:>8.3f} {throughput:>12.0f}")
+
+
+# Real-world UPI alerts outside the upi_dataset.csv templates; they share
+# generic words (account, order, subscription, ...) with non-UPI messages
+OUT_OF_TEMPLATE_UPI = [
+    "HDFC Bank: Rs 250.00 debited from account XX1234 to VPA swiggy@okaxis via UPI",
+    "ICICI Bank: Your order payment of Rs 499 to Amazon via UPI Ref 123456789 is successful",
+    "Axis Bank: Rs 1,200 paid to Netflix subscription via UPI. Ref 998877. Manage account in app",
+    "Kotak: Rs 500 added to your wallet via UPI. UPI Ref 445566. View details in app",
+    "SBI: Rs 75 sent to new payee rahul@oksbi. Ref 778899. Share receipt with friends",
+    "PNB: Your bill of Rs 300 confirmed and paid to shop@ybl. Rate your experience"
+]
+
+
+def evaluate_cascade(csv_path='upi_dataset.csv', backend_name='sklearn', rules_path='cascade_rules.json'):
+    """
+    Check the cascade against the model alone on held-out data
+
+    Scores the cached test split (the rules are learned on the training
+    split) and a set of out-of-template UPI messages.
+
+    Returns:
+        bool: True if cascade accuracy is at least the model's on the test
+              split and no rule gives an out-of-template UPI message a wrong verdict
+    """
+    data = cached_dataset(csv_path, FEATURIZER_CONFIG, lambda: featurize_dataset(csv_path))
+    test_idx = np.asarray(data.arrays['test_idx'])
+    df = pd.read_csv(csv_path)
+    messages = df['message'].astype(str).iloc[test_idx].tolist()
+    y = df['label'].to_numpy()[test_idx]
+
+    backend = load_backend(backend_name)
+    cascade = load_cascade(backend, rules_path)
+    rules = cascade.rules
+
+    start = time.perf_counter()
+    model_labels, _ = backend.classify(messages)
+    model_seconds = time.perf_counter() - start
+    model_labels = np.asarray(model_labels)
+    cascade_labels, _ = cascade.classify(messages)
+
+    verdicts = [rules.match(m, extract_sender(m)) for m in messages]
+    decided = np.array([v is not None for v in verdicts])
+    rule_labels = np.array([v[0] if v is not None else -1 for v in verdicts])
+
+    model_accuracy = float(np.mean(model_labels == y))
+    cascade_accuracy = float(np.mean(cascade_labels == y))
+    agreement = float(np.mean(cascade_labels == model_labels))
+    rule_precision = float(np.mean(rule_labels[decided] == y[decided])) if decided.any() else float('nan')
+
+    print(f"Rules: {len(rules.keywords)} keywords, {len(rules.senders)} senders")
+    print(f"Held-out test split: {len(messages)} messages")
+    print(f"Model only ({backend_name}): accuracy {model_accuracy*100:.2f}%, "
+          f"{model_seconds * 1000 / len(messages):.3f} ms/message")
+    print(f"Cascade: accuracy {cascade_accuracy*100:.2f}%, agreement with model {agreement*100:.2f}%")
+    print(f"Rule stage: decided {decided.sum()}/{len(messages)} ({decided.mean()*100:.2f}%), "
+          f"precision {rule_precision*100:.2f}%")
+    print(f"\n{'stage':<8} {'messages':>9} {'decided':>8} {'pass rate':>10} {'ms/message':>11}")
+    for stage in cascade.stats():
+        print(f"{stage['stage']:<8} {stage['messages']:>9} {stage['decided']:>8} "
+              f"{stage['pass_rate']*100:>9.2f}% {stage['mean_latency_ms']:>11.3f}")
+
+    print("\nOut-of-template UPI messages (rule verdict / model label):")
+    oot_model_labels, _ = backend.classify(OUT_OF_TEMPLATE_UPI)
+    wrong_verdicts = 0
+    for message, model_label in zip(OUT_OF_TEMPLATE_UPI, oot_model_labels):
+        verdict = rules.match(message, extract_sender(message))
+        if verdict is not None and verdict[0] != 1:
+            wrong_verdicts += 1
+        rule_text = 'defer' if verdict is None else str(verdict[0])
+        print(f"  {rule_text:>5} / {int(model_label)}  {message}")
+    print(f"Wrong rule verdicts: {wrong_verdicts}/{len(OUT_OF_TEMPLATE_UPI)}")
+
+    return cascade_accuracy >= model_accuracy and wrong_verdicts == 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare and benchmark UPI inference backends")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    parity_parser = subparsers.add_parser('parity', help="Check ONNX predictions against sklearn")
+    parity_parser.add_argument('--limit', type=int, default=None)
+    parity_parser.add_argument('--atol', type=float, default=1e-4)
+
+    bench_parser = subparsers.add_parser('benchmark', help="Time the sklearn and ONNX backends")
+    bench_parser.add_argument('--n-single', type=int, default=500)
+    bench_parser.add_argument('--batch-size', type=int, default=256)
+    bench_parser.add_argument('--repeats', type=int, default=5)
+
+    cascade_parser = subparsers.add_parser('cascade', help="Compare the cascade against the model alone")
+    cascade_parser.add_argument('--csv', default='upi_dataset.csv')
+    cascade_parser.add_argument('--backend', default='sklearn', choices=sorted(BACKENDS))
+
+    args = parser.parse_args()
+    if args.command == 'parity':
+        sys.exit(0 if check_parity(limit=args.limit, atol=args.atol) else 1)
+    elif args.command == 'cascade':
+        sys.exit(0 if evaluate_cascade(args.csv, args.backend) else 1)
+    else:
+        benchmark(n_single=args.n_single, batch_size=args.batch_size, repeats=args.repeats)
@@ -1,14 +1,18 @@
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split, StratifiedKFold
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.preprocessing import LabelEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
+from sklearn.base import clone
 from sklearn.naive_bayes import MultinomialNB
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
 import re
+import scipy.sparse as sp
+from dataset_cache import CACHE_DIR, cached_dataset
+from cascade import CascadeRules
 
 def extract_sender(message):
     """Extract sender from the message"""
@@ -23,7 +27,27 @@ def preprocess_text(text):
     text = re.sub(r'\s+', ' ', text).strip()
     return text
 
-def train_upi_classifier(csv_path='upi_dataset.csv'):
+# Featurizer settings; any change here invalidates the dataset cache
+FEATURIZER_CONFIG = {
+    'version': 4,
+    'tfidf': {'stop_words': 'english', 'max_features': 5000, 'ngram_range': (1, 2)},
+    'test_size': 0.2,
+    'random_state': 42,
+    'cv_folds': 5
+}
+
+def featurize_dataset(csv_path, config=FEATURIZER_CONFIG):
+    """
+    Parse the CSV and build the classifier feature matrix
+
+    The preprocessor is fit on the training split only, then applied to
+    every row so later runs can slice train/test out of one matrix. Each
+    cross-validation fold gets its own matrix from a preprocessor fit on
+    that fold's training rows, so CV scores stay free of leakage.
+
+    Returns:
+        tuple: (arrays, matrices, artifacts) for cached_dataset
+    """
     # Load dataset
     df = pd.read_csv(csv_path)
     
@@ -35,37 +59,70 @@ def train_upi_classifier(csv_path='upi_dataset.csv'):
     le = LabelEncoder()
     df['sender_encoded'] = le.fit_transform(df['sender'])
     
-    # Prepare features and labels
-    X = df[['processed_message', 'sender_encoded']]
-    y = df['label']
-    
     # Create preprocessing for different feature types
     preprocessor = ColumnTransformer(
         transformers=[
-            ('msg_tfidf', TfidfVectorizer(
-                stop_words='english', 
-                max_features=5000, 
-                ngram_range=(1, 2)
-            ), 'processed_message'),
+            ('msg_tfidf', TfidfVectorizer(**config['tfidf']), 'processed_message'),
             ('sender', 'passthrough', ['sender_encoded'])
         ])
     
-    # Create pipeline with preprocessing and classification
-    pipeline = Pipeline([
-        ('preprocessor', preprocessor),
-        ('classifier', MultinomialNB())
-    ])
-    
     # Split dataset
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
+    train_idx, test_idx = train_test_split(
+        np.arange(len(df)), test_size=config['test_size'], random_state=config['random_state']
     )
     
+    X = df[['processed_message', 'sender_encoded']]
+    preprocessor.fit(X.iloc[train_idx])
+    features = sp.csr_matrix(preprocessor.transform(X), dtype=np.float64)
+    matrices = {'features': features}
+    
+    # Per-fold featurizations, matching cross_val_score(pipeline, X, y, cv=5)
+    cv_fold = np.empty(len(df), dtype=np.int64)
+    folds = StratifiedKFold(n_splits=config['cv_folds']).split(X, df['label'])
+    for fold, (fold_train, fold_test) in enumerate(folds):
+        cv_fold[fold_test] = fold
+        fold_preprocessor = clone(preprocessor).fit(X.iloc[fold_train])
+        matrices[f'cv_features_{fold}'] = sp.csr_matrix(fold_preprocessor.transform(X), dtype=np.float64)
+    
+    arrays = {
+        'message': df['message'].to_numpy(dtype=str),
+        'processed_message': df['processed_message'].to_numpy(dtype=str),
+        'sender': df['sender'].to_numpy(dtype=str),
+        'label': df['label'].to_numpy(),
+        'train_idx': train_idx,
+        'test_idx': test_idx,
+        'cv_fold': cv_fold
+    }
+    artifacts = {'preprocessor': preprocessor, 'label_encoder': le}
+    return arrays, matrices, artifacts
+
+def train_upi_classifier(csv_path='upi_dataset.csv', cache_dir=CACHE_DIR,
+                         rules_path='cascade_rules.json'):
+    # Load featurized dataset (parsed and vectorized once per data/config version)
+    data = cached_dataset(csv_path, FEATURIZER_CONFIG,
+                          lambda: featurize_dataset(csv_path), cache_dir)
+    preprocessor = data.artifacts['preprocessor']
+    le = data.artifacts['label_encoder']
+    
+    # Prepare features and labels
+    X = data.matrices['features']
+    y = np.asarray(data.arrays['label'])
+    train_idx, test_idx = data.arrays['train_idx'], data.arrays['test_idx']
+    X_train, X_test = X[train_idx], X[test_idx]
+    y_train, y_test = y[train_idx], y[test_idx]
+    
     # Train model
-    pipeline.fit(X_train, y_train)
+    classifier = MultinomialNB()
+    classifier.fit(X_train, y_train)
+    
+    # Pipeline with the already fitted preprocessing and classification
+    pipeline = Pipeline([
+        ('preprocessor', preprocessor),
+        ('classifier', classifier)
+    ])
     
     # Predictions and evaluation
-    y_pred = pipeline.predict(X_test)
+    y_pred = classifier.predict(X_test)
     accuracy = accuracy_score(y_test, y_pred)
     
     # Print results
@@ -75,8 +132,14 @@ def train_upi_classifier(csv_path='upi_dataset.csv'):
     print("\nConfusion Matrix:")
     print(confusion_matrix(y_test, y_pred))
     
-    # Perform cross-validation
-    cv_scores = cross_val_score(pipeline, X, y, cv=5)
+    # Perform cross-validation on the cached per-fold feature matrices
+    cv_fold = np.asarray(data.arrays['cv_fold'])
+    cv_scores = np.array([
+        MultinomialNB()
+        .fit(data.matrices[f'cv_features_{fold}'][cv_fold != fold], y[cv_fold != fold])
+        .score(data.matrices[f'cv_features_{fold}'][cv_fold == fold], y[cv_fold == fold])
+        for fold in range(FEATURIZER_CONFIG['cv_folds'])
+    ])
     print(f"\nCross-validation Scores: {cv_scores}")
     print(f"Mean CV Score: {cv_scores.mean():.4f} (+/- {cv_scores.std() * 2:.4f})")
     
@@ -85,6 +148,15 @@ def train_upi_classifier(csv_path='upi_dataset.csv'):
     joblib.dump(le, 'sender_label_encoder.pkl')
     print("\nModel and Label Encoder saved successfully!")
     
+    # Refresh the cascade prefilter rules from the same training split
+    rules = CascadeRules.learn(
+        data.arrays['message'][train_idx],
+        data.arrays['sender'][train_idx],
+        y_train
+    )
+    rules.save(rules_path)
+    print(f"Cascade rules saved ({len(rules.keywords)} keywords, {len(rules.senders)} senders)")
+    
     return pipeline, le
 
 def predict_upi_message(model, le, message):
@@ -117,17 +189,18 @@ def predict_upi_message(model, le, message):
         'details': f"Predicted as {'UPI' if prediction[0] else 'Non-UPI'} message"
     }
 
-# Train the model
-model, label_encoder = train_upi_classifier()
+if __name__ == "__main__":
+    # Train the model
+    model, label_encoder = train_upi_classifier()
 
-# Example predictions
-test_messages = [
-    "SBI: Your a/c XXXXX1234 credited INR 5000.00 by UPI REF NO 789456 on 15-Feb-25. Bal: INR 50000",
-    "Friend Amit: Hey, what's up? Wanna grab coffee later?",
-    "Netflix: Your monthly subscription is due. Pay now to continue uninterrupted service."
-]
+    # Example predictions
+    test_messages = [
+        "SBI: Your a/c XXXXX1234 credited INR 5000.00 by UPI REF NO 789456 on 15-Feb-25. Bal: INR 50000",
+        "Friend Amit: Hey, what's up? Wanna grab coffee later?",
+        "Netflix: Your monthly subscription is due. Pay now to continue uninterrupted service."
+    ]
 
-print("\nTest Message Predictions:")
-for msg in test_messages:
-    print(f"\nMessage: {msg}")
-    print(predict_upi_message(model, label_encoder, msg))
\ No newline at end of file
+    print("\nTest Message Predictions:")
+    for msg in test_messages:
+        print(f"\nMessage: {msg}")
+        print(predict_upi_message(model, label_encoder, msg))
\ No newline at end of file
@@ -0,0 +1,175 @@
+# Export steps (artifacts are generated, not committed):
+#   pip install -r requirements-onnx.txt
+#   python model.py        # trains upi_classifier_model.pkl on upi_dataset.csv
+#   python Amount.py       # trains upi_extraction_models.pkl on upi_extraction.csv
+#   python onnx_export.py  # writes the .onnx graphs and JSON sidecars
+import os
+import json
+import joblib
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import OneHotEncoder
+from sklearn.base import is_classifier
+from Amount import load_extraction_models
+
+# skl2onnx is only needed to export; the ONNX backend in inference.py uses onnxruntime
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+
+# Input tensor name expected by Backend/index.js
+INPUT_NAME = 'input'
+
+
+def _tfidf_block(vectorizer, column):
+    """Describe a fitted TfidfVectorizer so it can be replayed without sklearn"""
+    if vectorizer.analyzer != 'word' or vectorizer.tokenizer is not None \
+            or vectorizer.preprocessor is not None or vectorizer.strip_accents is not None:
+        raise ValueError("Only word analyzers with the default tokenizer can be exported")
+    if vectorizer.use_idf is False or vectorizer.binary:
+        raise ValueError("Only use_idf=True, binary=False vectorizers can be exported")
+
+    vocabulary = {term: int(index) for term, index in vectorizer.vocabulary_.items()}
+    stop_words = vectorizer.get_stop_words()
+    return {
+        'type': 'tfidf',
+        'column': column,
+        'size': len(vocabulary),
+        'lowercase': bool(vectorizer.lowercase),
+        'token_pattern': vectorizer.token_pattern,
+        'ngram_range': list(vectorizer.ngram_range),
+        'stop_words': sorted(stop_words) if stop_words else [],
+        'norm': vectorizer.norm,
+        'sublinear_tf': bool(vectorizer.sublinear_tf),
+        'vocabulary': vocabulary,
+        'idf': [float(v) for v in vectorizer.idf_]
+    }
+
+
+def _onehot_block(encoder, column):
+    """Describe a fitted OneHotEncoder for a single column"""
+    if encoder.drop is not None or encoder.handle_unknown != 'ignore':
+        raise ValueError("Only OneHotEncoder(handle_unknown='ignore') can be exported")
+    categories = [str(c) for c in encoder.categories_[0]]
+    return {
+        'type': 'onehot',
+        'column': column,
+        'size': len(categories),
+        'categories': categories
+    }
+
+
+def describe_preprocessor(preprocessor):
+    """
+    Build the feature sidecar for a fitted ColumnTransformer
+
+    Args:
+        preprocessor (ColumnTransformer): Fitted preprocessing step of a pipeline
+
+    Returns:
+        dict: Block-by-block description of the feature layout
+    """
+    # Fitted 'passthrough' entries are wrapped in a FunctionTransformer, so use the spec
+    passthrough = {name for name, t, _ in preprocessor.transformers if t == 'passthrough'}
+
+    blocks = []
+    offset = 0
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == 'remainder':
+            if transformer != 'drop':
+                raise ValueError("Only remainder='drop' can be exported")
+            continue
+
+        if isinstance(transformer, TfidfVectorizer):
+            block = _tfidf_block(transformer, columns)
+        elif isinstance(transformer, OneHotEncoder):
+            if len(columns) != 1:
+                raise ValueError(f"Transformer '{name}' must encode exactly one column")
+            block = _onehot_block(transformer, columns[0])
+        elif name in passthrough:
+            block = {'type': 'passthrough', 'columns': list(columns), 'size': len(columns)}
+        else:
+            raise ValueError(f"Unsupported transformer '{name}': {transformer!r}")
+
+        block['name'] = name
+        block['offset'] = offset
+        offset += block['size']
+        blocks.append(block)
+
+    return {'n_features': offset, 'blocks': blocks}
+
+
+def export_estimator(estimator, n_features, onnx_path):
+    """
+    Convert the final estimator of a pipeline to ONNX
+
+    The graph takes the already featurized float matrix, so TF-IDF stays
+    exact and identical between the Python and JS featurizers.
+    """
+    options = {id(estimator): {'zipmap': False}} if is_classifier(estimator) else None
+    onnx_model = convert_sklearn(
+        estimator,
+        initial_types=[(INPUT_NAME, FloatTensorType([None, n_features]))],
+        options=options
+    )
+    with open(onnx_path, 'wb') as f:
+        f.write(onnx_model.SerializeToString())
+
+
+def export_classifier(model_path='upi_classifier_model.pkl',
+                      encoder_path='sender_label_encoder.pkl',
+                      onnx_path='upi_classifier_model.onnx',
+                      sidecar_path='tfidf_feature_names.json'):
+    """Export the model.py UPI classifier and its feature sidecar"""
+    pipeline = joblib.load(model_path)
+    le = joblib.load(encoder_path)
+
+    sidecar = describe_preprocessor(pipeline.named_steps['preprocessor'])
+    sidecar['classes'] = [int(c) for c in pipeline.classes_]
+    sidecar['label_encoders'] = {'sender': [str(c) for c in le.classes_]}
+
+    export_estimator(pipeline.named_steps['classifier'], sidecar['n_features'], onnx_path)
+    with open(sidecar_path, 'w', encoding='utf-8') as f:
+        json.dump(sidecar, f, ensure_ascii=False)
+
+    print(f"Classifier exported to {onnx_path} ({sidecar['n_features']} features)")
+
+
+def export_extraction_models(models_path='upi_extraction_models.pkl',
+                             onnx_prefix='upi_extraction',
+                             sidecar_path='upi_extraction_features.json'):
+    """
+    Export the Amount.py sender, merchant and amount pipelines
+
+    The three pipelines share one fitted preprocessor, so the sidecar holds
+    a single feature block and inference featurizes each batch once.
+    """
+    models = load_extraction_models(models_path)
+
+    features = None
+    sidecar = {'models': {}, 'label_encoders': {}}
+    for key in ('sender', 'merchant', 'amount'):
+        pipeline = models[f'{key}_model']
+        model_features = describe_preprocessor(pipeline.named_steps['preprocessor'])
+        if features is None:
+            features = model_features
+        elif model_features != features:
+            raise ValueError("Extraction models must share one fitted preprocessor")
+
+        onnx_path = f'{onnx_prefix}_{key}.onnx'
+        export_estimator(pipeline.steps[-1][1], features['n_features'], onnx_path)
+        # Stored relative to the sidecar so the artifacts can be moved together
+        sidecar['models'][key] = {
+            'onnx_path': os.path.relpath(onnx_path, os.path.dirname(os.path.abspath(sidecar_path)))
+        }
+        print(f"{key.capitalize()} model exported to {onnx_path} ({features['n_features']} features)")
+
+    sidecar['features'] = features
+    for key in ('sender', 'merchant'):
+        sidecar['label_encoders'][key] = [str(c) for c in models[f'{key}_encoder'].classes_]
+
+    with open(sidecar_path, 'w', encoding='utf-8') as f:
+        json.dump(sidecar, f, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    export_classifier()
+    export_extraction_models()
@@ -0,0 +1,104 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
+
+pytest.importorskip('onnxruntime')
+pytest.importorskip('skl2onnx')
+
+from model import featurize_dataset
+from Amount import UPIMessageExtractor
+from onnx_export import export_classifier, export_extraction_models
+from inference import SklearnBackend, OnnxBackend
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _slice_csv(name, rows, tmp_path):
+    path = tmp_path / name
+    pd.read_csv(os.path.join(ML_DIR, name)).head(rows).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def artifacts(tmp_path_factory):
+    """Train small models on dataset slices and export them to ONNX"""
+    tmp_path = tmp_path_factory.mktemp('artifacts')
+
+    # Classifier, trained the same way as train_upi_classifier
+    classifier_csv = _slice_csv('upi_dataset.csv', 600, tmp_path)
+    arrays, matrices, fitted = featurize_dataset(classifier_csv)
+    train_idx = arrays['train_idx']
+    classifier = MultinomialNB().fit(matrices['features'][train_idx], arrays['label'][train_idx])
+    joblib.dump(Pipeline([('preprocessor', fitted['preprocessor']), ('classifier', classifier)]),
+                tmp_path / 'classifier.pkl')
+    joblib.dump(fitted['label_encoder'], tmp_path / 'sender_encoder.pkl')
+
+    # Extraction models, trained the same way as train_extraction_models
+    extraction_csv = _slice_csv('upi_extraction.csv', 600, tmp_path)
+    extractor = UPIMessageExtractor()
+    data = extractor.load_dataset(dataset_path=extraction_csv, cache_dir=None)
+    X_train = data.matrices['features'][data.arrays['train_idx']]
+    targets = {key: np.asarray(data.arrays[key])[data.arrays['train_idx']]
+               for key in ('sender_encoded', 'merchant_encoded', 'amount')}
+    estimators = {
+        'sender': RandomForestClassifier(n_estimators=5, random_state=0).fit(X_train, targets['sender_encoded']),
+        'merchant': RandomForestClassifier(n_estimators=5, random_state=0).fit(X_train, targets['merchant_encoded']),
+        'amount': RandomForestRegressor(n_estimators=5, random_state=0).fit(X_train, targets['amount'])
+    }
+    models = {f'{key}_model': Pipeline([('preprocessor', extractor.preprocessor), ('estimator', estimator)])
+              for key, estimator in estimators.items()}
+    models['sender_encoder'] = extractor.sender_encoder
+    models['merchant_encoder'] = extractor.merchant_encoder
+    joblib.dump(models, tmp_path / 'extraction.pkl')
+
+    export_classifier(str(tmp_path / 'classifier.pkl'), str(tmp_path / 'sender_encoder.pkl'),
+                      str(tmp_path / 'classifier.onnx'), str(tmp_path / 'classifier.json'))
+    export_extraction_models(str(tmp_path / 'extraction.pkl'), str(tmp_path / 'extraction'),
+                             str(tmp_path / 'extraction.json'))
+
+    sklearn_backend = SklearnBackend(str(tmp_path / 'classifier.pkl'), str(tmp_path / 'sender_encoder.pkl'),
+                                     str(tmp_path / 'extraction.pkl'))
+    onnx_backend = OnnxBackend(str(tmp_path / 'classifier.onnx'), str(tmp_path / 'classifier.json'),
+                               str(tmp_path / 'extraction.json'))
+    messages = {
+        'classifier': pd.read_csv(classifier_csv)['message'].tolist(),
+        'extraction': pd.read_csv(extraction_csv)['message'].tolist()
+    }
+    return sklearn_backend, onnx_backend, messages
+
+
+def test_classifier_parity(artifacts):
+    sklearn_backend, onnx_backend, messages = artifacts
+    sk_labels, sk_proba = sklearn_backend.classify(messages['classifier'])
+    ox_labels, ox_proba = onnx_backend.classify(messages['classifier'])
+
+    np.testing.assert_array_equal(np.asarray(sk_labels), np.asarray(ox_labels))
+    np.testing.assert_allclose(sk_proba, ox_proba, atol=1e-4)
+
+
+def test_extraction_parity(artifacts):
+    sklearn_backend, onnx_backend, messages = artifacts
+    sk_details = sklearn_backend.extract(messages['extraction'])
+    ox_details = onnx_backend.extract(messages['extraction'])
+
+    assert [d['sender'] for d in sk_details] == [d['sender'] for d in ox_details]
+    assert [d['merchant'] for d in sk_details] == [d['merchant'] for d in ox_details]
+    # Amounts are rounded to paise, so allow one unit of rounding difference
+    np.testing.assert_allclose([d['amount'] for d in sk_details],
+                               [d['amount'] for d in ox_details], atol=0.01 + 1e-9)
+
+
+def test_unseen_sender_parity(artifacts):
+    sklearn_backend, onnx_backend, _ = artifacts
+    messages = ["Friend Amit: Hey, what's up? Wanna grab coffee later?",
+                "Netflix: Your monthly subscription is due. Pay now to continue uninterrupted service."]
+    sk_labels, sk_proba = sklearn_backend.classify(messages)
+    ox_labels, ox_proba = onnx_backend.classify(messages)
+
+    np.testing.assert_array_equal(np.asarray(sk_labels), np.asarray(ox_labels))
+    np.testing.assert_allclose(sk_proba, ox_proba, atol=1e-4)